@@ -1,6 +1,5 @@
 import asyncio
 import logging
-import pytz
 import os
 import sys
 
@@ -19,12 +18,26 @@ from src.configuration.config import Settings
 logger = logging.getLogger(__name__)
 
 
-async def hash_jira_issue_data(data: list) -> list[dict[str, str | None]]:
+async def hash_jira_issue_data(data: list,
+                               known_hashes: dict[int, dict] | None = None) -> list[dict[str, str | None]]:
     """
-    Возвращаем list[dict] хэш полей, для сравнения: issue_id, h_description, h_attachment.
+    Возвращаем list[dict] хэш полей, для сравнения: issue_id, h_description, h_attachment, updated.
+    Если updated задачи совпадает с сохраненным в known_hashes(записи из Redis),
+    хэши копируются как есть — без повторной нормализации и хэширования.
     """
+    known_hashes = known_hashes or {}
     issue_hash_list: list[dict[str, str | None]] = []
     for issue in data:
+        known = known_hashes.get(issue['id'])
+        if known and known.get('updated') and known['updated'] == issue.get('updated'):
+            issue_hash_list.append({
+                'issue_id': issue['id'],
+                'h_description': known.get('h_description'),
+                'h_attachment': known.get('h_attachment'),
+                'updated': known['updated'],
+            })
+            continue
+
         issue_hash = dict()
         issue_hash['issue_id'] = issue['id']
         text = h.canon_text(s=issue['description'])
@@ -34,6 +47,7 @@ async def hash_jira_issue_data(data: list) -> list[dict[str, str | None]]:
             issue_hash['h_attachment'] = h.hash_attachment_id(attachment)
         else:
             issue_hash['h_attachment'] = None
+        issue_hash['updated'] = issue.get('updated')
 
         issue_hash_list.append(issue_hash)
     return issue_hash_list
@@ -48,13 +62,26 @@ def comment_description_format(data: dict) -> str:
             f'{data['description']}')
 
 
+def _describe_and_hash(data: dict) -> tuple[str, str]:
+    """
+    Возвращает пару (description, h_description) для комментария.
+    Форматирование и хэширование выполняются один раз на комментарий.
+    """
+    description = comment_description_format(data=data)
+    h_description = h.hash_text(text=h.canon_text(s=description))
+    return description, h_description
+
+
 def logging_config() -> None:
     """
-    Настройка логирования.
+    Настройка логирования. Выполняется один раз при старте,
+    повторные вызовы не добавляют новых хэндлеров.
     """
+    if getattr(logging_config, "_done", False):
+        return
+    logging_config._done = True
     _log_directory = 'logs/'
     time = current_time()
-    timezone = pytz.timezone("Asia/Novosibirsk")
     log_file_path = os.path.join(_log_directory, f'{time[:10]}_err_generator.log')
     os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
     file_handler = logging.FileHandler(filename=log_file_path, mode='a', encoding='utf-8')
@@ -70,15 +97,95 @@ def logging_config() -> None:
     )
     file_handler.setLevel(logging.ERROR)
     file_handler.setFormatter(
-        CustomFormatter(fmt=log_format, datefmt=date_format, style='{', tz=timezone)
+        CustomFormatter(fmt=log_format, datefmt=date_format, style='{')
     )
     logging.getLogger().addHandler(file_handler)
 
 
+async def _process_comment(data: dict,
+                           conf: Settings,
+                           r: Redis,
+                           pf: planfix.PlanfixClient,
+                           issue_links: dict,
+                           sem: asyncio.Semaphore) -> None:
+    """
+    Обработка одного комментария: сравнение хэша и обновление/добавление в Planfix и Redis.
+    """
+    async with sem:
+        redis_comment = await repo.get_comment(r=r, comment_j_id=data['id'])
+        description, h_description = _describe_and_hash(data=data)
+
+        if redis_comment:
+            """Сравниваем хэш, отслеживаем изменения"""
+            redis_h_description = redis_comment['h_description']
+            equal = h.hashes_equal(h1=redis_h_description,
+                                   h2=h_description)
+            if not equal:
+
+                try:
+                    await pf.update_comment(
+                        description=description,
+                        comment_id=redis_comment['comment_p_id'],
+                    )
+                    await repo.upsert_comment(
+                        r=r,
+                        comment_j_id=data['id'],
+                        comment_p_id=redis_comment['comment_p_id'],
+                        p_issue_id=redis_comment['p_issue_id'],
+                        h_description=h_description
+                    )
+                    logger.info(f'Комментарий был успешно обновлен в Planfix и redis. '
+                                f'Planfix comment ID: {redis_comment["comment_p_id"]} '
+                                f'Jira comment ID: {redis_comment["comment_j_id"]}')
+                except RuntimeError:
+                    logger.error('Что то пошло не так, в блоке работы с обновлением комментариев')
+                    await send_alert_to_chat(text=f'Что то пошло не так, '
+                                                  f'в блоке работы с новыми комментариев'
+                                                  f'Jira ID: {data['issue_id']}',
+                                             chat_id=conf.BOT_CHAT_ID)
+
+        else:
+            """Комментарий отсутствует в Redis, добавляем его в Planfix и записываем в Redis"""
+            jira_planfix_link = issue_links.get(data['issue_id'])
+
+            if not jira_planfix_link:
+                logger.info(f'Связь Jira + Planfix отсутствует в redis, необходимо проверить. '
+                            f'Jira ID: {data['issue_id']}')
+                await send_alert_to_chat(text=f'Связь Jira + Planfix отсутствует в redis, '
+                                              f'необходимо проверить. '
+                                              f'Jira ID: {data['issue_id']}',
+                                         chat_id=conf.BOT_CHAT_ID)
+                return
+
+            try:
+                comment_p_id = await pf.add_comment(
+                    description=description,
+                    planfix_task_id=jira_planfix_link['p_issue'],
+                    owner_id=conf.PLANFIX_OWNER_COMMENT
+                )
+
+                await repo.upsert_comment(
+                    r=r,
+                    comment_j_id=data['id'],
+                    comment_p_id=comment_p_id,
+                    p_issue_id=jira_planfix_link['p_issue'],
+                    h_description=h_description
+                )
+                logger.info(
+                    f'Новый комментарий добавлен к задаче. Planfix task ID: {jira_planfix_link['p_issue']}')
+            except Exception as ex:
+                logger.error(f'Что то пошло не так, в блоке работы с новыми комментариями.\n'
+                             f'Error: {ex}')
+                await send_alert_to_chat(text=f'Что то пошло не так, '
+                                              f'в блоке работы с новыми комментариями'
+                                              f'Jira ID: {data['issue_id']}',
+                                         chat_id=conf.BOT_CHAT_ID)
+
+
 async def comments(conf: Settings,
                    jira_issues_data: list,
                    r: Redis,
-                   sid: str) -> None:
+                   pf: planfix.PlanfixClient) -> None:
     """
     Работа с комментариями.
     Если есть комментарии в задачах которые отслеживаются, загружаем комментарии из Jira.
@@ -87,104 +194,27 @@ async def comments(conf: Settings,
     Если комментарий присутствует в Redis, мы сравниваем хэш значения description текущего комментария с h_description из
     Redis. Если хэш разный, то обновляем комментарий в Planfix и обновляем хэш значение в Redis. Если хэш равен,
     то пропускаем.
+    Комментарии обрабатываются конкурентно, параллелизм ограничен семафором.
+    Обработка каждой задачи стартует сразу после ответа Jira, не дожидаясь остальных.
     """
-    request = [jira.get_issue_comments(issue_id=i['id']) for i in jira_issues_data]
-    comments_data = await asyncio.gather(*request)
-
-    if comments_data:
-        for comment_list in comments_data:
-
-            if comment_list:
-                for data in comment_list:
-                    redis_comment = await repo.get_comment(r=r, comment_j_id=data['id'])
-
-                    if redis_comment:
-                        """Сравниваем хэш, отслеживаем изменения"""
-                        description = comment_description_format(data=data)
-                        text = h.canon_text(s=description)
-                        h_description = h.hash_text(text=text)
-                        redis_h_description = redis_comment['h_description']
-                        equal = h.hashes_equal(h1=redis_h_description,
-                                               h2=h_description)
-                        if not equal:
-
-                            try:
-                                await planfix.update_comment(
-                                    account=conf.PLANFIX_ACCOUNT,
-                                    api_key=conf.PLANFIX_API_KEY,
-                                    url=conf.PLANFIX_URL,
-                                    sid=sid,
-                                    description=description,
-                                    comment_id=redis_comment['comment_p_id'],
-                                )
-                                await repo.upsert_comment(
-                                    r=r,
-                                    comment_j_id=data['id'],
-                                    comment_p_id=redis_comment['comment_p_id'],
-                                    p_issue_id=redis_comment['p_issue_id'],
-                                    h_description=h_description
-                                )
-                                logger.info(f'Комментарий был успешно обновлен в Planfix и redis. '
-                                            f'Planfix comment ID: {redis_comment["comment_p_id"]} '
-                                            f'Jira comment ID: {redis_comment["comment_j_id"]}')
-                            except RuntimeError:
-                                logger.error('Что то пошло не так, в блоке работы с обновлением комментариев')
-                                await send_alert_to_chat(text=f'Что то пошло не так, '
-                                                              f'в блоке работы с новыми комментариев'
-                                                              f'Jira ID: {data['issue_id']}',
-                                                         chat_id=conf.BOT_CHAT_ID)
-
-                    else:
-                        """Комментарий отсутствует в Redis, добавляем его в Planfix и записываем в Redis"""
-                        jira_planfix_link = await repo.get_issue_link(r=r, j_issue=data['issue_id'])
-
-                        if not jira_planfix_link:
-                            logger.info(f'Связь Jira + Planfix отсутствует в redis, необходимо проверить. '
-                                        f'Jira ID: {data['issue_id']}')
-                            await send_alert_to_chat(text=f'Связь Jira + Planfix отсутствует в redis, '
-                                                          f'необходимо проверить. '
-                                                          f'Jira ID: {data['issue_id']}',
-                                                     chat_id=conf.BOT_CHAT_ID)
-                            continue
-
-                        description = comment_description_format(data=data)
-                        try:
-                            comment_p_id = await planfix.add_comment(
-                                account=conf.PLANFIX_ACCOUNT,
-                                api_key=conf.PLANFIX_API_KEY,
-                                url=conf.PLANFIX_URL,
-                                sid=sid,
-                                description=description,
-                                planfix_task_id=jira_planfix_link['p_issue'],
-                                owner_id=conf.PLANFIX_OWNER_COMMENT
-                            )
-
-                            text = h.canon_text(s=description)
-                            h_description = h.hash_text(text=text)
-
-                            await repo.upsert_comment(
-                                r=r,
-                                comment_j_id=data['id'],
-                                comment_p_id=comment_p_id,
-                                p_issue_id=jira_planfix_link['p_issue'],
-                                h_description=h_description
-                            )
-                            logger.info(
-                                f'Новый комментарий добавлен к задаче. Planfix task ID: {jira_planfix_link['p_issue']}')
-                        except Exception as ex:
-                            logger.error(f'Что то пошло не так, в блоке работы с новыми комментариями.\n'
-                                         f'Error: {ex}')
-                            await send_alert_to_chat(text=f'Что то пошло не так, '
-                                                          f'в блоке работы с новыми комментариями'
-                                                          f'Jira ID: {data['issue_id']}',
-                                                     chat_id=conf.BOT_CHAT_ID)
+    issue_links = await repo.get_issue_links_bulk(r=r, j_issues=[i['id'] for i in jira_issues_data])
+
+    sem = asyncio.Semaphore(64)
+    tasks: list[asyncio.Task] = []
+    coros = [jira.get_issue_comments(issue_id=i['id']) for i in jira_issues_data]
+    for fut in asyncio.as_completed(coros):
+        comment_list = await fut
+        for data in comment_list:
+            tasks.append(asyncio.create_task(
+                _process_comment(data=data, conf=conf, r=r, pf=pf, issue_links=issue_links, sem=sem)))
+    await asyncio.gather(*tasks, return_exceptions=True)
 
 
 async def in_redis_issues(in_redis_issues_ids: list,
-                          r: Redis,
-                          issue_hash_list: list,
+                          redis_issues_by_id: dict[int, dict],
+                          hash_by_id: dict[int, dict],
                           updated_issues_data: list,
-                          upload_issues_to_planfix_ids: list,
+                          upload_issues_to_planfix_ids: set[int],
                           conf: Settings) -> None:
     """
     Если задачи присутствуют в Redis, мы сравниваем хэш description, attachment текущей задачи с данными из Redis.
@@ -198,9 +228,8 @@ async def in_redis_issues(in_redis_issues_ids: list,
     for issue_id in in_redis_issues_ids:
         try:
 
-            equal: bool
-            redis_issue = await repo.get_issue(r=r, issue_id=issue_id)
-            jira_issue = next(i for i in issue_hash_list if int(i['issue_id']) == issue_id)
+            redis_issue = redis_issues_by_id[issue_id]
+            jira_issue = hash_by_id[issue_id]
 
             equal_description: bool = h.hashes_equal(h1=redis_issue['h_description'],
                                                      h2=jira_issue['h_description'])
@@ -212,28 +241,131 @@ async def in_redis_issues(in_redis_issues_ids: list,
             else:
                 equal_attachment = False
 
-            equal = False if equal_description and equal_attachment else True
+            changed = not (equal_description and equal_attachment)
 
-            if equal:
+            if changed:
                 issue_data: dict = dict()
                 issue_data['id'] = issue_id
                 issue_data['h_description'] = not equal_description
                 issue_data['h_attachment'] = not equal_attachment
                 updated_issues_data.append(issue_data)
-                upload_issues_to_planfix_ids.append(issue_id)
+                upload_issues_to_planfix_ids.add(issue_id)
         except Exception as ex:
             logger.error(f'Ошибка при сравнении хэша. Ошибка: {ex}')
             await send_alert_to_chat(text=f'Ошибка при сравнении хэша. Ошибка: {ex}',
                                      chat_id=conf.BOT_CHAT_ID)
 
 
-async def upload_issues_to_planfix(upload_issues_to_planfix_ids: list,
-                                   issue_hash_list: list,
+async def _update_issue_in_planfix(issue_id: tuple,
+                                   updated_by_id: dict[int, dict],
+                                   jira_by_id: dict[int, dict],
+                                   conf: Settings,
+                                   pf: planfix.PlanfixClient,
+                                   sem: asyncio.Semaphore) -> None:
+    """
+    Обновление уже созданной задачи Planfix: описание и/или вложения.
+    issue_id = (planfix_id, jira_id).
+    """
+    async with sem:
+        issue_data = updated_by_id[issue_id[1]]
+        jira_issue_data = jira_by_id[issue_id[1]]
+
+        try:
+            if issue_data.get('h_description'):
+                await pf.update_description_task(
+                    issue_id=issue_id[0],
+                    description=jira_issue_data['description'],
+                    jira_issue_link=jira_issue_data.get('issue_link', ''),
+                )
+        except RuntimeError:
+            logger.error(f'Ошибка при обновлении описании задачи в planfix. '
+                         f'Planfix ID: {issue_id[0]}. Jira ID: {issue_id[1]}')
+            await send_alert_to_chat(text=f'Ошибка при обновлении описании задачи в planfix. '
+                                          f'Planfix ID: {issue_id[0]}. Jira ID: {issue_id[1]}',
+                                     chat_id=conf.BOT_CHAT_ID)
+
+        try:
+            if issue_data.get('h_attachment'):
+                list_saved_attachments = await jira.get_issue_attachments(
+                    attachments=jira_issue_data['attachment'],
+                    issue_key=issue_id[0]
+                )
+                logger.info(f'Вложения загружены. Задача ID: {issue_id} '
+                            f'Путь: {list_saved_attachments}')
+
+                await pf.upload_file(
+                    planfix_task_id=issue_id[0],
+                    jira_task_id=issue_id[1]
+                )
+        except RuntimeError:
+            logger.error(f'Не удалось обновить вложения в planfix. '
+                         f'Planfix ID: {issue_id[0]}, Jira ID: {issue_id[1]}')
+            await send_alert_to_chat(text=f'Не удалось обновить вложения в planfix. '
+                                          f'Planfix ID: {issue_id[0]}, Jira ID: {issue_id[1]}',
+                                     chat_id=conf.BOT_CHAT_ID)
+
+
+async def _create_issue_in_planfix(issue_id: int,
+                                   jira_by_id: dict[int, dict],
+                                   jira_planfix_ids: list[tuple[int, int, int]],
+                                   r: Redis,
+                                   conf: Settings,
+                                   pf: planfix.PlanfixClient,
+                                   sem: asyncio.Semaphore) -> None:
+    """
+    Создание новой задачи в Planfix: задача, связка в Redis, вложения.
+    """
+    async with sem:
+        jira_issue_data = jira_by_id[issue_id]
+        try:
+            p_issue_id = await pf.add_task(
+                workers_id=conf.PLANFIX_WORKERS,
+                members_id=conf.PLANFIX_MEMBERS,
+                title=jira_issue_data.get('title'),
+                description=jira_issue_data.get('description'),
+                project_id=conf.PLANFIX_PROJECT_ID,
+                jira_issue_link=jira_issue_data.get('issue_link', ''),
+            )
+        except RuntimeError:
+            logger.error(f'Ошибка при создании задачи в planfix. '
+                         f'Jira ID: {jira_issue_data["id"]}')
+            await send_alert_to_chat(text=f'Ошибка при создании задачи в planfix. '
+                                          f'Jira ID: {jira_issue_data["id"]}',
+                                     chat_id=conf.BOT_CHAT_ID)
+            return
+
+        jira_planfix_ids.append((issue_id, int(p_issue_id), jira_issue_data['attachmentCount']))
+        await repo.upsert_issue_link(r=r,
+                                     j_issue=issue_id,
+                                     p_issue=int(p_issue_id))
+
+        try:
+            if jira_issue_data['attachment']:
+                list_saved_attachments = await jira.get_issue_attachments(
+                    attachments=jira_issue_data['attachment'],
+                    issue_key=issue_id
+                )
+                logger.info(f'Вложения загружены. Задача ID: {issue_id} '
+                            f'Путь: {list_saved_attachments}')
+                await pf.upload_file(
+                    planfix_task_id=int(p_issue_id),
+                    jira_task_id=issue_id
+                )
+        except RuntimeError:
+            logger.error(f'Ошибка при загрузки вложений. '
+                         f'Planfix ID: {p_issue_id}')
+            await send_alert_to_chat(text=f'Ошибка при загрузки вложений.\n'
+                                          f'Planfix ID: {p_issue_id}',
+                                     chat_id=conf.BOT_CHAT_ID)
+
+
+async def upload_issues_to_planfix(upload_issues_to_planfix_ids: set[int],
+                                   hash_by_id: dict[int, dict],
                                    updated_issues_data: list,
-                                   jira_issues_list_data: list,
+                                   jira_by_id: dict[int, dict],
                                    r: Redis,
                                    conf: Settings,
-                                   sid: str) -> None:
+                                   pf: planfix.PlanfixClient) -> None:
     """
     Если upload_issues_to_planfix_ids пуст, то return.
     Записываем/обновляем данные о задачах в Redis.
@@ -243,149 +375,68 @@ async def upload_issues_to_planfix(upload_issues_to_planfix_ids: list,
     if not upload_issues_to_planfix_ids:
         return
 
-    for issue_id in issue_hash_list:
-        if int(issue_id['issue_id']) in upload_issues_to_planfix_ids:
-            try:
-
-                result = await repo.upsert_issue_hash(r=r,
-                                                      issue_id=int(issue_id['issue_id']),
-                                                      h_description=issue_id['h_description'],
-                                                      h_attachment=issue_id['h_attachment'])
-                if result:
-                    logger.info(f'Новая запись добавлена. Jira ID: {issue_id['issue_id']}')
-                else:
-                    logger.info(f'Запись обновлена. Jira ID: {issue_id['issue_id']}')
-            except Exception as ex:
-                logger.error(f'Ошибка при записи/обновлении задачи jira в redis. '
-                             f'Jira ID: {issue_id['issue_id']}. '
-                             f'Ошибка: {ex}')
-                await send_alert_to_chat(text=f'Ошибка при записи/обновлении задачи jira в redis. '
-                                              f'Jira ID: {issue_id['issue_id']}. '
-                                              f'Ошибка: {ex}',
-                                         chat_id=conf.BOT_CHAT_ID)
+    """Все upsert'ы уходят одним pipeline — один round trip вместо N"""
+    items = [(issue_id,
+              hash_by_id[issue_id]['h_description'],
+              hash_by_id[issue_id]['h_attachment'],
+              hash_by_id[issue_id].get('updated'))
+             for issue_id in upload_issues_to_planfix_ids]
+    try:
+        results = await repo.upsert_issue_hashes_bulk(r=r, items=items)
+        for issue_id, result in results.items():
+            if result:
+                logger.info(f'Новая запись добавлена. Jira ID: {issue_id}')
+            else:
+                logger.info(f'Запись обновлена. Jira ID: {issue_id}')
+    except Exception as ex:
+        logger.error(f'Ошибка при записи/обновлении задач jira в redis. '
+                     f'Ошибка: {ex}')
+        await send_alert_to_chat(text=f'Ошибка при записи/обновлении задач jira в redis. '
+                                      f'Ошибка: {ex}',
+                                 chat_id=conf.BOT_CHAT_ID)
 
     in_planfix_ids: list[tuple] = []
     not_in_planfix_ids: list[int] = []
 
+    links = await repo.get_issue_links_bulk(r=r, j_issues=list(upload_issues_to_planfix_ids))
     for issue_id in upload_issues_to_planfix_ids:
-        jira_planfix = await repo.get_issue_link(r=r,
-                                                 j_issue=issue_id)
+        jira_planfix = links.get(issue_id)
         if jira_planfix:
-            in_planfix_ids.append((int(jira_planfix['p_issue']), issue_id))
+            in_planfix_ids.append((jira_planfix['p_issue'], issue_id))
         else:
             not_in_planfix_ids.append(issue_id)
 
-    if in_planfix_ids:
-        for issue_id in in_planfix_ids:
-
-            issue_data = next(i for i in updated_issues_data if i['id'] == issue_id[1])
-            jira_issue_data = next(i for i in jira_issues_list_data if int(i['id']) == issue_id[1])
-
-            try:
-                if issue_data.get('h_description'):
-                    await planfix.update_description_task(
-                        account=conf.PLANFIX_ACCOUNT,
-                        api_key=conf.PLANFIX_API_KEY,
-                        url=conf.PLANFIX_URL,
-                        sid=sid,
-                        issue_id=issue_id[0],
-                        description=jira_issue_data['description'],
-                        jira_issue_link=jira_issue_data.get('issue_link', ''),
-                    )
-            except RuntimeError:
-                logger.error(f'Ошибка при обновлении описании задачи в planfix. '
-                             f'Planfix ID: {issue_id[0]}. Jira ID: {issue_id[1]}')
-                await send_alert_to_chat(text=f'Ошибка при обновлении описании задачи в planfix. '
-                                              f'Planfix ID: {issue_id[0]}. Jira ID: {issue_id[1]}',
-                                         chat_id=conf.BOT_CHAT_ID)
+    """Независимые задачи обрабатываются конкурентно, параллелизм ограничен семафором"""
+    sem = asyncio.Semaphore(8)
 
-            try:
-                if issue_data.get('h_attachment'):
-                    list_saved_attachments = await jira.get_issue_attachments(
-                        attachments=jira_issue_data['attachment'],
-                        issue_key=issue_id[0]
-                    )
-                    logger.info(f'Вложения загружены. Задача ID: {issue_id} '
-                                f'Путь: {list_saved_attachments}')
-
-                    await planfix.upload_file(
-                        account=conf.PLANFIX_ACCOUNT,
-                        api_key=conf.PLANFIX_API_KEY,
-                        url=conf.PLANFIX_URL,
-                        sid=sid,
-                        planfix_task_id=issue_id[0],
-                        jira_task_id=issue_id[1]
-                    )
-            except RuntimeError:
-                logger.error(f'Не удалось обновить вложения в planfix. '
-                             f'Planfix ID: {issue_id[0]}, Jira ID: {issue_id[1]}')
-                await send_alert_to_chat(text=f'Не удалось обновить вложения в planfix. '
-                                              f'Planfix ID: {issue_id[0]}, Jira ID: {issue_id[1]}',
-                                         chat_id=conf.BOT_CHAT_ID)
+    if in_planfix_ids:
+        updated_by_id = {i['id']: i for i in updated_issues_data}
+        await asyncio.gather(*[_update_issue_in_planfix(issue_id=issue_id,
+                                                        updated_by_id=updated_by_id,
+                                                        jira_by_id=jira_by_id,
+                                                        conf=conf,
+                                                        pf=pf,
+                                                        sem=sem)
+                               for issue_id in in_planfix_ids])
 
     if not_in_planfix_ids:
 
         jira_planfix_ids: list[tuple[int, int, int]] = []
 
-        for issue_id in not_in_planfix_ids:
-
-            jira_issue_data = next(i for i in jira_issues_list_data if int(i['id']) == issue_id)
-            try:
-                p_issue_id = await planfix.add_task(
-                    account=conf.PLANFIX_ACCOUNT,
-                    api_key=conf.PLANFIX_API_KEY,
-                    url=conf.PLANFIX_URL,
-                    sid=sid,
-                    workers_id=conf.PLANFIX_WORKERS,
-                    members_id=conf.PLANFIX_MEMBERS,
-                    title=jira_issue_data.get('title'),
-                    description=jira_issue_data.get('description'),
-                    project_id=conf.PLANFIX_PROJECT_ID,
-                    jira_issue_link=jira_issue_data.get('issue_link', ''),
-                )
-            except RuntimeError:
-                logger.error(f'Ошибка при создании задачи в planfix. '
-                             f'Jira ID: {jira_issue_data["id"]}')
-                await send_alert_to_chat(text=f'Ошибка при создании задачи в planfix. '
-                                              f'Jira ID: {jira_issue_data["id"]}',
-                                         chat_id=conf.BOT_CHAT_ID)
-                return
+        await asyncio.gather(*[_create_issue_in_planfix(issue_id=issue_id,
+                                                        jira_by_id=jira_by_id,
+                                                        jira_planfix_ids=jira_planfix_ids,
+                                                        r=r,
+                                                        conf=conf,
+                                                        pf=pf,
+                                                        sem=sem)
+                               for issue_id in not_in_planfix_ids])
 
-            jira_planfix_ids.append((issue_id, int(p_issue_id), jira_issue_data['attachmentCount']))
-            await repo.upsert_issue_link(r=r,
-                                         j_issue=issue_id,
-                                         p_issue=int(p_issue_id))
-
-            try:
-                if jira_issue_data['attachment']:
-                    list_saved_attachments = await jira.get_issue_attachments(
-                        attachments=jira_issue_data['attachment'],
-                        issue_key=issue_id
-                    )
-                    logger.info(f'Вложения загружены. Задача ID: {issue_id} '
-                                f'Путь: {list_saved_attachments}')
-                    await planfix.upload_file(
-                        account=conf.PLANFIX_ACCOUNT,
-                        api_key=conf.PLANFIX_API_KEY,
-                        url=conf.PLANFIX_URL,
-                        sid=sid,
-                        planfix_task_id=int(p_issue_id),
-                        jira_task_id=issue_id
-                    )
-            except RuntimeError:
-                logger.error(f'Ошибка при загрузки вложений. '
-                             f'Planfix ID: {p_issue_id}')
-                await send_alert_to_chat(text=f'Ошибка при загрузки вложений.\n'
-                                              f'Planfix ID: {p_issue_id}',
-                                         chat_id=conf.BOT_CHAT_ID)
 
-
-async def job():
+async def job(pool):
 
     conf = Settings()
 
-    logging_config()
-
     try:
         jira_issues_self_data = await jira.get_issues_self()
         request = [jira.get_issue_data(url=u) for u in jira_issues_self_data]
@@ -397,17 +448,19 @@ async def job():
         sys.exit(1)
 
 
-    issue_hash_list = await hash_jira_issue_data(data=jira_issues_list_data)
-    jira_issues_ids = [int(i['issue_id']) for i in issue_hash_list]
+    jira_by_id = {i['id']: i for i in jira_issues_list_data}
+    jira_issues_ids = list(jira_by_id)
 
     try:
-        sid = await planfix.get_sid(
-            account=conf.PLANFIX_ACCOUNT,
-            login=conf.PLANFIX_LOGIN,
-            password=conf.PLANFIX_PASSWORD,
-            api_key=conf.PLANFIX_API_KEY,
-            url=conf.PLANFIX_URL,
-        )
+        sid = await planfix.get_sid(account=conf.PLANFIX_ACCOUNT,
+                                    login=conf.PLANFIX_LOGIN,
+                                    password=conf.PLANFIX_PASSWORD,
+                                    api_key=conf.PLANFIX_API_KEY,
+                                    url=conf.PLANFIX_URL)
+        pf = planfix.PlanfixClient(account=conf.PLANFIX_ACCOUNT,
+                                   api_key=conf.PLANFIX_API_KEY,
+                                   url=conf.PLANFIX_URL,
+                                   sid=sid)
         logger.info('SID Planfix успешно получен.')
     except Exception as ex:
         logger.exception(f"Не удалось получить SID Planfix. Error: {ex}")
@@ -415,50 +468,79 @@ async def job():
                                  chat_id=conf.BOT_CHAT_ID)
         sys.exit(1)
 
-    async with storage.redis_client(host=conf.REDIS_HOST,
-                                    port=conf.REDIS_PORT,
-                                    decode_responses=True) as r:
+    async with storage.redis_client(pool=pool) as r:
         redis_issues_ids = await repo.list_issue_ids(r=r, batch=500)
 
         updated_issues_data: list[dict] = [] # список измененных задач. dict = {id: int, description: bool, attachment: bool}
 
-        upload_issues_to_planfix_ids = list(set(jira_issues_ids) - set(redis_issues_ids))
-        in_redis_issues_ids = list(set(jira_issues_ids) - set(upload_issues_to_planfix_ids))
+        jira_ids_set = set(jira_issues_ids)
+        redis_ids_set = set(redis_issues_ids)
+        upload_issues_to_planfix_ids = jira_ids_set - redis_ids_set
+        in_redis_issues_ids = list(jira_ids_set & redis_ids_set)
+
+        redis_issues_by_id = await repo.get_issues_bulk(r=r, issue_ids=in_redis_issues_ids)
+
+        """Задачи, у которых updated в Jira не изменился с прошлого цикла, не хэшируем и не сравниваем"""
+        unchanged_ids = {issue_id for issue_id, redis_issue in redis_issues_by_id.items()
+                         if redis_issue.get('updated')
+                         and redis_issue['updated'] == jira_by_id[issue_id].get('updated')}
+        in_redis_issues_ids = [i for i in in_redis_issues_ids if i not in unchanged_ids]
+
+        issue_hash_list = await hash_jira_issue_data(data=jira_issues_list_data,
+                                                     known_hashes=redis_issues_by_id)
+        hash_by_id = {i['issue_id']: i for i in issue_hash_list}
 
         await in_redis_issues(
             in_redis_issues_ids=in_redis_issues_ids,
-            r=r,
-            issue_hash_list=issue_hash_list,
+            redis_issues_by_id=redis_issues_by_id,
+            hash_by_id=hash_by_id,
             updated_issues_data=updated_issues_data,
             upload_issues_to_planfix_ids=upload_issues_to_planfix_ids,
             conf=conf)
 
         await upload_issues_to_planfix(
             upload_issues_to_planfix_ids=upload_issues_to_planfix_ids,
-            issue_hash_list=issue_hash_list,
+            hash_by_id=hash_by_id,
             updated_issues_data=updated_issues_data,
-            jira_issues_list_data=jira_issues_list_data,
+            jira_by_id=jira_by_id,
             r=r,
             conf=conf,
-            sid=sid)
+            pf=pf)
 
         await comments(
             conf=conf,
             jira_issues_data=jira_issues_list_data,
             r=r,
-            sid=sid)
+            pf=pf)
 
 async def main():
     conf = Settings()
-    while True:
-        try:
-            await job()
-        except Exception as ex:
-            logger.error(f"Error occurred while executing job: {ex}")
-        finally:
-            await asyncio.sleep(conf.SLEEP_INTERVAL)
+    logging_config()
+    pool = storage.create_pool(host=conf.REDIS_HOST,
+                               port=conf.REDIS_PORT,
+                               decode_responses=True)
+    try:
+        while True:
+            try:
+                await job(pool=pool)
+            except Exception as ex:
+                logger.error(f"Error occurred while executing job: {ex}")
+                """SID мог протухнуть посреди цикла — на следующем цикле логинимся заново"""
+                planfix.invalidate_sid()
+            finally:
+                await asyncio.sleep(conf.SLEEP_INTERVAL)
+    finally:
+        await pool.aclose()
+        await jira.aclose_client()
+        await planfix.aclose_client()
 
 if __name__ == '__main__':
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        """uvloop недоступен (например, Windows) — остаемся на стандартном event loop"""
+        pass
     try:
         asyncio.run(main())
     except KeyboardInterrupt or CancelledError:
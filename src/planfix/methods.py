@@ -1,8 +1,35 @@
+import time
 import httpx
 import base64
+import aiofiles
 from lxml import etree
 from pathlib import Path
-from jinja2 import Template
+from xml.sax.saxutils import escape
+
+"""Один клиент на все запросы к Planfix: keep-alive вместо handshake на каждый вызов"""
+_limits = httpx.Limits(max_keepalive_connections=16, max_connections=32)
+_client = httpx.AsyncClient(limits=_limits, timeout=30, http2=True)
+
+
+async def aclose_client() -> None:
+    """Закрывает общий httpx-клиент при остановке сервиса"""
+    await _client.aclose()
+
+
+"""XPath-выражения компилируются один раз на модуль, а не на каждый вызов"""
+_ID_XP = etree.XPath("string(//id)")
+_SID_XP = etree.XPath("string(//sid)")
+
+
+"""Кэш SID: живет ~1 час на стороне Planfix, перелогиниваемся не чаще TTL"""
+_SID_TTL = 1800.0
+_sid_cache: tuple[str, float] | None = None
+
+
+def invalidate_sid() -> None:
+    """Сбрасывает кэш SID (например, после ошибки авторизации)"""
+    global _sid_cache
+    _sid_cache = None
 
 
 def _to_cdata(text: str) -> str:
@@ -15,42 +42,41 @@ async def get_sid(account: str,
                   password: str,
                   api_key: str,
                   url: str) -> str:
+    global _sid_cache
+    now = time.monotonic()
+    if _sid_cache and now < _sid_cache[1]:
+        return _sid_cache[0]
+
     headers = {
         "Accept": "application/xml"
     }
 
-    tmpl = Template("""    
-    <request method="auth.login">          
-        <account>{{ account }}</account>      
-        <login>{{ login }}</login>      
-        <password>{{ password }}</password>    
-    </request>      
-    """)
-
-    data: str = tmpl.render(
-        account=account,
-        login=login,
-        password=password
+    data: str = f"""
+    <request method="auth.login">
+        <account>{account}</account>
+        <login>{login}</login>
+        <password>{escape(password)}</password>
+    </request>
+    """
+    r = await _client.post(
+        url,
+        auth=(api_key, ""),
+        headers=headers,
+        data=data
     )
-    async with httpx.AsyncClient() as client:
-        r = await client.post(
-            url,
-            auth=(api_key, ""),
-            headers=headers,
-            data=data
-        )
-        if r.status_code != 200:
-            raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
+    if r.status_code != 200:
+        raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
 
     try:
         root = etree.fromstring(r.content)
     except etree.XMLSyntaxError as e:
         raise RuntimeError(f"Невалидный xml: {e}: {r.text[:200]}")
 
-    sid = root.xpath("string(//sid)") or None
+    sid = _SID_XP(root) or None
     if not sid:
         raise RuntimeError("В ответе нет <sid>: " + r.text[:200])
 
+    _sid_cache = (sid, now + _SID_TTL)
     return sid
 
 
@@ -67,78 +93,42 @@ async def add_task(account: str,
     headers = {
         "Accept": "application/xml"
     }
-    title      = f'[JIRA] {title}'
-    workers_id = workers_id.split(',')
-    members_id = members_id.split(',')
-
-    tmpl_user_id = Template("""
-			        <id>{{ user_id }}</id>            
-    """)
-
-    members_tmpl_list: list = []
-    for m in members_id:
-        tmp = tmpl_user_id.render(
-            user_id=m,
-        )
-        members_tmpl_list.append(tmp)
-
-    workers_tmpl_list: list = []
-    for w in workers_id:
-        tmp = tmpl_user_id.render(
-            user_id=w,
-        )
-        workers_tmpl_list.append(tmp)
-
-    workers_id = '\n'.join(workers_tmpl_list)
-    members_id = '\n'.join(members_tmpl_list)
-
-    tmpl = Template("""  
-    <request method="task.add">    
-	    <account>{{ account }}</account>  
-	    <sid>{{ sid }}</sid>    
-	    <task>
-		    <title>{{ title }} </title>          
-	        <description>{{ description }}</description>          
-	        <workers>              
-                <users>   
-                    {{ workers_id }}
-                </users>          
-	        </workers>  
-	        <members>
-                <users>            
-                    {{ members_id }}       
-                </users>
-			</members>        
-			<project>            
-				<id>{{ project_id }}</id>        
-			</project>    
-		</task>    
-    </request>    
-    """)
+    # title приходит из Jira — экранируем спецсимволы XML
+    title      = escape(f'[JIRA] {title}')
+    workers_id = ''.join(f'<id>{w}</id>' for w in workers_id.split(','))
+    members_id = ''.join(f'<id>{m}</id>' for m in members_id.split(','))
 
     description = _to_cdata(description)
     description = description +'\n\n'+'Ссылка на задачу: '+ jira_issue_link
 
-
-    data: str = tmpl.render(
-        account=account,
-        sid=sid,
-        workers_id=workers_id,
-        members_id=members_id,
-        project_id=project_id,
-        title=title,
-        description=description
-    )
+    data: str = f"""
+    <request method="task.add">
+	    <account>{account}</account>
+	    <sid>{sid}</sid>
+	    <task>
+		    <title>{title}</title>
+	        <description>{description}</description>
+	        <workers>
+                <users>{workers_id}</users>
+	        </workers>
+	        <members>
+                <users>{members_id}</users>
+			</members>
+			<project>
+				<id>{project_id}</id>
+			</project>
+		</task>
+    </request>
+    """
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                url,
-                auth=(api_key, ""),
-                headers=headers,
-                data=data
-            )
-            if r.status_code != 200:
-                raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
+        r = await _client.post(
+            url,
+            auth=(api_key, ""),
+            headers=headers,
+            data=data
+        )
+        if r.status_code != 200:
+            raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
     except httpx.HTTPError as e:
         raise RuntimeError(f"soap fault: {e}")
 
@@ -147,7 +137,7 @@ async def add_task(account: str,
     except etree.XMLSyntaxError as e:
         raise RuntimeError(f"Невалидный xml: {e}: {r.text[:200]}")
 
-    general = root.xpath("string(//id)") or None
+    general = _ID_XP(root) or None
     if not general:
         raise RuntimeError("В ответе нет <general>: " + r.text[:200])
 
@@ -165,43 +155,40 @@ async def update_description_task(
     headers = {
         "Accept": "application/xml"
     }
-    tmpl = Template("""  
-        <request method="task.update">    
-    	    <account>{{ account }}</account>  
-    	    <sid>{{ sid }}</sid>    
-    	    <task>
-    	        <general>{{ issue_id }}</general>    
-    	        <description>{{ description }}</description>          
-    		</task>    
-        </request>    
-    """)
-
     description = _to_cdata(description)
     description = description + '\n\n' + 'Ссылка на задачу: ' + jira_issue_link
 
-    data: str = tmpl.render(
-        account=account,
-        issue_id=issue_id,
-        sid=sid,
-        description=description
-    )
+    data: str = f"""
+        <request method="task.update">
+    	    <account>{account}</account>
+    	    <sid>{sid}</sid>
+    	    <task>
+    	        <general>{issue_id}</general>
+    	        <description>{description}</description>
+    		</task>
+        </request>
+    """
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                url,
-                auth=(api_key, ""),
-                headers=headers,
-                data=data
-            )
-            if r.status_code != 200:
-                raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
+        r = await _client.post(
+            url,
+            auth=(api_key, ""),
+            headers=headers,
+            data=data
+        )
+        if r.status_code != 200:
+            raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
     except httpx.HTTPError as e:
         raise RuntimeError(f"soap fault: {e}: {r.text[:200]}")
 
 
 def b64(path: str) -> str:
+    """Кодирует файл кусками, не держа в памяти несколько полноразмерных копий"""
+    chunks: list[str] = []
     with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode("ascii")
+        # размер куска кратен 3, чтобы base64 не вставлял паддинг на стыках
+        while chunk := f.read(57 * 1024):
+            chunks.append(base64.b64encode(chunk).decode("ascii"))
+    return "".join(chunks)
 
 
 async def upload_file(account: str,
@@ -210,65 +197,45 @@ async def upload_file(account: str,
                       sid: str,
                       planfix_task_id: int,
                       jira_task_id: int) -> None:
-    file = Template("""
-               <file>          
-                   <name>{{FILE_NAME}}</name>          
-                   <sourceType>FILESYSTEM</sourceType>          
-                   <body>{{FILE_BODY_B64}}</body>          
-                   <newversion>1</newversion>        
-                </file>
-    """)
     out_dir = Path("downloads") / str(jira_task_id)
     if not out_dir.exists():
         raise FileNotFoundError(f"Directory {out_dir} does not exist.")
     f_names_list = [p.name for p in out_dir.iterdir() if p.is_file()]
-    template_files_list: list = []
-    for f in f_names_list:
-
-        path = out_dir / f
-        file_body_b64 = b64(path=str(path))
-        tmp = file.render(
-            FILE_NAME=f,
-            FILE_BODY_B64=file_body_b64,
-        )
-        template_files_list.append(tmp)
-
-    files = '\n'.join(template_files_list)
-
-    xml = Template("""  
-            <request method="file.upload">
-              <account>{{ACCOUNT}}</account>      
-              <sid>{{SID}}</sid>          
-              <task><id>{{TASK_ID}}</id></task>
-              <target>task</target>
-                <files>
-                   {{FILES}}   
-                </files>    
-            </request>
-	""")
 
-    data = xml.render(
-        ACCOUNT=account,
-        SID=sid,
-        TASK_ID=planfix_task_id,
-        FILES=files
-    )
+    async def _xml_stream():
+        """Тело запроса отдается кусками: в памяти не бывает больше одного чанка base64"""
+        yield (f'<request method="file.upload">'
+               f'<account>{account}</account>'
+               f'<sid>{sid}</sid>'
+               f'<task><id>{planfix_task_id}</id></task>'
+               f'<target>task</target>'
+               f'<files>').encode()
+        for f in f_names_list:
+            yield (f'<file>'
+                   f'<name>{escape(f)}</name>'
+                   f'<sourceType>FILESYSTEM</sourceType>'
+                   f'<body>').encode()
+            async with aiofiles.open(out_dir / f, "rb") as fh:
+                # размер куска кратен 3, чтобы base64 не вставлял паддинг на стыках
+                while chunk := await fh.read(57 * 1024):
+                    yield base64.b64encode(chunk)
+            yield b'</body><newversion>1</newversion></file>'
+        yield b'</files></request>'
 
     headers = {"Accept": "application/xml",
                "Content-Type": "application/xml; charset=utf-8"}
 
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                url,
-                auth=(api_key, ""),
-                headers=headers,
-                data=data
-            )
-            if r.status_code != 200:
-                raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
+        r = await _client.post(
+            url,
+            auth=(api_key, ""),
+            headers=headers,
+            content=_xml_stream()
+        )
+        if r.status_code != 200:
+            raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
     except Exception as e:
-        raise RuntimeError(f"soap fault: {e}: {r.text[:200]}")
+        raise RuntimeError(f"soap fault: {e}")
 
 
 async def add_comment(account: str,
@@ -279,43 +246,35 @@ async def add_comment(account: str,
                       planfix_task_id: int | str,
                       owner_id: str) -> str:
 
-    xml = Template("""  
+    description = _to_cdata(description)
+
+    data = f"""
             <request method="action.add">
-              <account>{{account}}</account>      
-              <sid>{{sid}}</sid>          
+              <account>{account}</account>
+              <sid>{sid}</sid>
               <action>
-                <description>{{description}}</description>
+                <description>{description}</description>
                 <task>
-                  <id>{{task_id}}</id>
+                  <id>{planfix_task_id}</id>
                 </task>
                 <owner>
-                  <id>{{owner_id}}</id>
-                </owner>   
+                  <id>{owner_id}</id>
+                </owner>
               </action>
             </request>
-	""")
-    description = _to_cdata(description)
-
-    data = xml.render(
-        account=account,
-        sid=sid,
-        description=description,
-        task_id=planfix_task_id,
-        owner_id=owner_id
-    )
+    """
     headers = {"Accept": "application/xml",
                "Content-Type": "application/xml; charset=utf-8"}
 
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                url,
-                auth=(api_key, ""),
-                headers=headers,
-                data=data
-            )
-            if r.status_code != 200:
-                raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
+        r = await _client.post(
+            url,
+            auth=(api_key, ""),
+            headers=headers,
+            data=data
+        )
+        if r.status_code != 200:
+            raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
     except Exception as e:
         raise RuntimeError(f"soap fault: {e}: {r.text[:200]}")
     try:
@@ -323,7 +282,7 @@ async def add_comment(account: str,
     except etree.XMLSyntaxError as e:
         raise RuntimeError(f"Невалидный xml: {e}: {r.text[:200]}")
 
-    id = root.xpath("string(//id)") or None
+    id = _ID_XP(root) or None
     if not id:
         raise RuntimeError("В ответе нет <id>: " + r.text[:200])
 
@@ -337,38 +296,31 @@ async def update_comment(account: str,
                          description: str,
                          comment_id: int | str) -> None:
 
-    xml = Template("""  
+    description = _to_cdata(description)
+
+    data = f"""
             <request method="action.update">
-              <account>{{account}}</account>      
-              <sid>{{sid}}</sid>          
+              <account>{account}</account>
+              <sid>{sid}</sid>
               <action>
-                <id>{{comment_id}}</id>
-                <description>{{description}}</description>   
+                <id>{comment_id}</id>
+                <description>{description}</description>
               </action>
             </request>
-	""")
-    description = _to_cdata(description)
-
-    data = xml.render(
-        account=account,
-        sid=sid,
-        description=description,
-        comment_id=comment_id,
-    )
+    """
 
     headers = {"Accept": "application/xml",
                "Content-Type": "application/xml; charset=utf-8"}
 
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                url,
-                auth=(api_key, ""),
-                headers=headers,
-                data=data
-            )
-            if r.status_code != 200:
-                raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
+        r = await _client.post(
+            url,
+            auth=(api_key, ""),
+            headers=headers,
+            data=data
+        )
+        if r.status_code != 200:
+            raise RuntimeError(f"soap fault: {r.status_code} {r.text}")
     except Exception as e:
         raise RuntimeError(f"soap fault: {e}: {r.text[:200]}")
 
@@ -377,5 +329,80 @@ async def update_comment(account: str,
     except etree.XMLSyntaxError as e:
         raise RuntimeError(f"Невалидный xml: {e}: {r.text[:200]}")
 
-    if not root.xpath("string(//id)") or None:
+    if not _ID_XP(root) or None:
         raise RuntimeError("В ответе нет <id>: " + str(r.content))
+
+
+class PlanfixClient:
+    """
+    Тонкая обертка над методами модуля: держит account/api_key/url/sid,
+    чтобы не передавать один и тот же набор kwargs на каждый вызов.
+    """
+
+    def __init__(self, account: str, api_key: str, url: str, sid: str):
+        self.account = account
+        self.api_key = api_key
+        self.url = url
+        self.sid = sid
+
+    async def add_task(self,
+                       workers_id: str,
+                       members_id: str,
+                       title: str,
+                       description: str,
+                       project_id: int,
+                       jira_issue_link: str) -> str:
+        return await add_task(account=self.account,
+                              api_key=self.api_key,
+                              url=self.url,
+                              sid=self.sid,
+                              workers_id=workers_id,
+                              members_id=members_id,
+                              title=title,
+                              description=description,
+                              project_id=project_id,
+                              jira_issue_link=jira_issue_link)
+
+    async def update_description_task(self,
+                                      issue_id: str,
+                                      description: str,
+                                      jira_issue_link: str) -> None:
+        await update_description_task(account=self.account,
+                                      api_key=self.api_key,
+                                      url=self.url,
+                                      sid=self.sid,
+                                      issue_id=issue_id,
+                                      description=description,
+                                      jira_issue_link=jira_issue_link)
+
+    async def upload_file(self,
+                          planfix_task_id: int,
+                          jira_task_id: int) -> None:
+        await upload_file(account=self.account,
+                          api_key=self.api_key,
+                          url=self.url,
+                          sid=self.sid,
+                          planfix_task_id=planfix_task_id,
+                          jira_task_id=jira_task_id)
+
+    async def add_comment(self,
+                          description: str,
+                          planfix_task_id: int | str,
+                          owner_id: str) -> str:
+        return await add_comment(account=self.account,
+                                 api_key=self.api_key,
+                                 url=self.url,
+                                 sid=self.sid,
+                                 description=description,
+                                 planfix_task_id=planfix_task_id,
+                                 owner_id=owner_id)
+
+    async def update_comment(self,
+                             description: str,
+                             comment_id: int | str) -> None:
+        await update_comment(account=self.account,
+                             api_key=self.api_key,
+                             url=self.url,
+                             sid=self.sid,
+                             description=description,
+                             comment_id=comment_id)
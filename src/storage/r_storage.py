@@ -1,10 +1,20 @@
-from redis.asyncio import Redis
+from redis.asyncio import ConnectionPool, Redis
 from contextlib import asynccontextmanager
 
 
+def create_pool(host: str, port: int, max_connections: int = 32, **kwargs) -> ConnectionPool:
+    """
+    Общий пул соединений, создается один раз в main() и переживает все циклы job().
+    """
+    return ConnectionPool(host=host,
+                          port=port,
+                          max_connections=max_connections,
+                          **kwargs)
+
+
 @asynccontextmanager
-async def redis_client(**kwargs):
-    r = Redis(**kwargs)
+async def redis_client(pool: ConnectionPool | None = None, **kwargs):
+    r = Redis(connection_pool=pool) if pool is not None else Redis(**kwargs)
     try:
         yield r
     finally:
@@ -1,19 +1,22 @@
-import re
 from redis.asyncio import Redis
 from typing import Optional, Any
 
 
-ID_RE = re.compile(r"^issue:(\d+)$")
+ISSUE_IDS_KEY = "issue_ids"
 
 UPSERT_J_ISSUE_LUA = """
 local key = KEYS[1]
+local ids_key = KEYS[2]
 local new_desc = ARGV[1]
 local new_att  = ARGV[2] or ""
+local new_upd  = ARGV[3] or ""
+local issue_id = ARGV[4]
 local changed = {}
 if redis.call('EXISTS', key) == 0 then
   local now = redis.call('TIME')[1]
   redis.call('HSET', key, 'created_at', now)
 end
+redis.call('SADD', ids_key, issue_id)
 local old_desc = redis.call('HGET', key, 'h_description')
 local old_att  = redis.call('HGET', key, 'h_attachment') or ""
 if (not old_desc) or (old_desc ~= new_desc) then
@@ -24,6 +27,9 @@ if old_att ~= new_att then
   redis.call('HSET', key, 'h_attachment', new_att)
   table.insert(changed, 'attach')
 end
+if new_upd ~= "" then
+  redis.call('HSET', key, 'updated', new_upd)
+end
 if #changed > 0 then
   redis.call('HSET', key, 'updated_at', redis.call('TIME')[1])
 end
@@ -71,14 +77,21 @@ redis.call('HSET', key, 'comment_j_id', j, 'comment_p_id', p, 'p_issue_id', p_is
 return is_new
 """
 
-async def prepare_scripts(r: Redis, lua_scripts: str):
-    return r.register_script(lua_scripts)
+"""Script-объекты регистрируются лениво один раз на процесс и переиспользуются"""
+_scripts: dict[str, Any] = {}
+
+
+def _get_script(r: Redis, lua: str):
+    script = _scripts.get(lua)
+    if script is None:
+        script = _scripts[lua] = r.register_script(lua)
+    return script
 
 
 async def get_issue(r: Redis, issue_id: int) -> Optional[dict[str, str]]:
     """
     Объект jira.
-    Возвращает dict{issue_id: int, h_description: str, h_attachment: str, created_at: str}.
+    Возвращает dict{issue_id: int, h_description: str, h_attachment: str, updated: str, created_at: str}.
     """
     data = await r.hgetall(f"issue:{issue_id}")
     if not data:
@@ -86,25 +99,77 @@ async def get_issue(r: Redis, issue_id: int) -> Optional[dict[str, str]]:
     out: dict[str, Any] = {"issue_id": issue_id}
     if "h_description" in data:   out["h_description"]   = data["h_description"]
     if "h_attachment" in data:   out["h_attachment"]   = data["h_attachment"]
+    if "updated" in data:    out["updated"]    = data["updated"]
     if "created_at" in data: out["created_at"] = data["created_at"]
     return out
 
 
+async def get_issues_bulk(r: Redis, issue_ids: list[int]) -> dict[int, dict[str, Any]]:
+    """
+    Объект jira.
+    Батч-чтение: один pipeline вместо N запросов по одному id.
+    Возвращает dict{issue_id: dict{issue_id: int, h_description: str, h_attachment: str, updated: str,
+    created_at: str}}.
+    """
+    if not issue_ids:
+        return {}
+    pipe = r.pipeline(transaction=False)
+    for issue_id in issue_ids:
+        pipe.hgetall(f"issue:{issue_id}")
+    results = await pipe.execute()
+
+    out: dict[int, dict[str, Any]] = {}
+    for issue_id, data in zip(issue_ids, results):
+        if not data:
+            continue
+        issue: dict[str, Any] = {"issue_id": issue_id}
+        if "h_description" in data:   issue["h_description"]   = data["h_description"]
+        if "h_attachment" in data:   issue["h_attachment"]   = data["h_attachment"]
+        if "updated" in data:    issue["updated"]    = data["updated"]
+        if "created_at" in data: issue["created_at"] = data["created_at"]
+        out[issue_id] = issue
+    return out
+
+
 async def upsert_issue_hash(
     r: Redis,
     issue_id: int,
     h_description: str,
-    h_attachment: str | None
+    h_attachment: str | None,
+    updated: str | None = None
 ) -> bool:
     """
     Записывает/обновляет связку. Возвращает True, если запись новая (created), иначе False.
     """
-    upsert_lua = await prepare_scripts(r, UPSERT_J_ISSUE_LUA)
+    upsert_lua = _get_script(r, UPSERT_J_ISSUE_LUA)
     key = f"issue:{issue_id}"
-    is_new = await upsert_lua(keys=[key], args=[h_description, h_attachment or ""])
+    is_new = await upsert_lua(keys=[key, ISSUE_IDS_KEY],
+                              args=[h_description, h_attachment or "", updated or "", str(int(issue_id))],
+                              client=r)
     return bool(is_new)
 
 
+async def upsert_issue_hashes_bulk(
+    r: Redis,
+    items: list[tuple[int, str, str | None, str | None]]
+) -> dict[int, bool]:
+    """
+    Батч-запись: все EVALSHA уходят одним pipeline вместо N round trip'ов.
+    items — кортежи (issue_id, h_description, h_attachment, updated).
+    Возвращает dict{issue_id: bool} — True, если запись новая/изменилась.
+    """
+    if not items:
+        return {}
+    upsert_lua = _get_script(r, UPSERT_J_ISSUE_LUA)
+    pipe = r.pipeline(transaction=False)
+    for issue_id, h_description, h_attachment, updated in items:
+        await upsert_lua(keys=[f"issue:{issue_id}", ISSUE_IDS_KEY],
+                         args=[h_description, h_attachment or "", updated or "", str(int(issue_id))],
+                         client=pipe)
+    results = await pipe.execute()
+    return {item[0]: bool(res) for item, res in zip(items, results)}
+
+
 async def upsert_issue_link(
         r: Redis,
         j_issue: int,
@@ -114,9 +179,9 @@ async def upsert_issue_link(
     Связка jira_id:planfix_id
     Записывает/обновляет связку. Возвращает True, если запись новая (created), иначе False.
     """
-    upsert_lua = await prepare_scripts(r, UPSERT_LINK_LUA)
+    upsert_lua = _get_script(r, UPSERT_LINK_LUA)
     key = f"issue_link:{j_issue}"
-    await upsert_lua(keys=[key], args=[str(int(j_issue)), str(int(p_issue))])
+    await upsert_lua(keys=[key], args=[str(int(j_issue)), str(int(p_issue))], client=r)
 
 
 async def get_issue_link(r: Redis, j_issue: int) -> Optional[dict[str, str]]:
@@ -133,16 +198,48 @@ async def get_issue_link(r: Redis, j_issue: int) -> Optional[dict[str, str]]:
     return out
 
 
+async def get_issue_links_bulk(r: Redis, j_issues: list[int]) -> dict[int, Optional[dict[str, Any]]]:
+    """
+    Связка jira_id:planfix_id
+    Батч-чтение: один pipeline вместо N запросов по одному id.
+    Возвращает dict{j_issue: dict{j_issue: int, p_issue: int, created_at: str} | None}.
+    """
+    if not j_issues:
+        return {}
+    pipe = r.pipeline(transaction=False)
+    for j_issue in j_issues:
+        pipe.hgetall(f"issue_link:{j_issue}")
+    results = await pipe.execute()
+
+    out: dict[int, Optional[dict[str, Any]]] = {}
+    for j_issue, data in zip(j_issues, results):
+        if not data:
+            out[j_issue] = None
+            continue
+        link: dict[str, Any] = {"j_issue": j_issue}
+        if "p_issue" in data:   link["p_issue"]   = int(data["p_issue"])
+        if "created_at" in data: link["created_at"] = data["created_at"]
+        out[j_issue] = link
+    return out
+
+
 async def list_issue_ids(r: Redis, batch: int = 500) -> list[int]:
     """
     Объект jira.
     Возвращает list[id].
+    Читает SET-индекс issue_ids одной командой; для записей, созданных до
+    появления индекса, один раз выполняется SCAN с дозаписью индекса.
     """
+    members = await r.smembers(ISSUE_IDS_KEY)
+    if members:
+        return [int(m) for m in members]
+
     ids: list[int] = []
     async for key in r.scan_iter(match="issue:[0-9]*", count=batch):
-        m = ID_RE.match(key)
-        if m:
-            ids.append(int(m.group(1)))
+        # match-фильтр уже гарантирует формат "issue:<цифры>" — срез вместо regex
+        ids.append(int(key[6:]))
+    if ids:
+        await r.sadd(ISSUE_IDS_KEY, *ids)
     return ids
 
 
@@ -157,11 +254,13 @@ async def upsert_comment(
     Связка comment_j_id:comment_p_id:p_issue_id
     Записывает/обновляет связку комментариев. Возвращает True, если запись новая (created), иначе False.
     """
-    upsert_lua = await prepare_scripts(r, UPSERT_COMMENT_LUA)  # получаем Lua-скрипт
+    upsert_lua = _get_script(r, UPSERT_COMMENT_LUA)  # получаем Lua-скрипт
     key = f"comment_link:{comment_j_id}"
 
     # Запускаем скрипт
-    is_new = await upsert_lua(keys=[key], args=[str(comment_j_id), str(comment_p_id), str(p_issue_id), h_description])
+    is_new = await upsert_lua(keys=[key],
+                              args=[str(comment_j_id), str(comment_p_id), str(p_issue_id), h_description],
+                              client=r)
 
     return bool(is_new)
 
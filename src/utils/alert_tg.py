@@ -1,11 +1,15 @@
 import logging
 from telegram import Bot
 from telegram.error import TelegramError
+from telegram.request import HTTPXRequest
 from src.configuration.config import Settings
 
 logger = logging.getLogger(__name__)
 settings = Settings()
-bot = Bot(token=settings.BOT_TOKEN)
+
+"""Постоянный пул соединений: алерты не платят за TCP/TLS handshake на каждый вызов"""
+_request = HTTPXRequest(connection_pool_size=4)
+bot = Bot(token=settings.BOT_TOKEN, request=_request)
 
 async def send_alert_to_chat(text: str,
                              chat_id: str) -> None:
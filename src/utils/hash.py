@@ -1,5 +1,4 @@
 import re, html, unicodedata
-import hmac
 import struct
 try:
     import blake3
@@ -10,38 +9,47 @@ except ImportError:
         def h_digest(b: bytes) -> bytes: return xxhash.xxh3_128(b).digest()
     except ImportError:
         import hashlib
-        def h_digest(b: bytes) -> bytes: return hashlib.sha256(b).digest()  # 256 бит
+        def h_digest(b: bytes) -> bytes: return hashlib.sha256(b).digest()[:16]  # усечение до 128 бит
 
 SPACE_RE = re.compile(r"[ \t]+")
-ZW_RE = re.compile(r"[\u200B-\u200D\uFEFF]")  # zero-width
+TAG_SPACE_RE = re.compile(r"(?:<[^>]+>|[ \t])+")
+ZW_TRANS = str.maketrans("", "", "\u200B\u200C\u200D\uFEFF")  # zero-width
+
+def _strip_collapse(m: re.Match) -> str:
+    # чистая цепочка тегов исчезает, цепочка с пробелами схлопывается в один
+    g = m.group()
+    return " " if (" " in g or "\t" in g) else ""
 
 def canon_text(s: str | None, strip_html: bool = True) -> str:
-    s = "" if s is None else s
+    if not s:
+        return ""
     if strip_html:
-        # удалим теги и декодируем сущности
-        s = re.sub(r"<[^>]+>", "", s)
+        # теги удаляются и пробелы схлопываются одним проходом
+        s = TAG_SPACE_RE.sub(_strip_collapse, s)
     # декодируем HTML-сущности
     s = html.unescape(s)
     # нормализация
     s = s.replace("\r\n", "\n").replace("\r", "\n")
-    s = unicodedata.normalize("NFC", s)
-    s = ZW_RE.sub("", s)
-    s = SPACE_RE.sub(" ", s)
+    if not s.isascii():
+        # NFC и zero-width актуальны только для не-ASCII текста
+        s = unicodedata.normalize("NFC", s)
+        s = s.translate(ZW_TRANS)
+    if not strip_html:
+        s = SPACE_RE.sub(" ", s)
     s = s.strip()
     s = s.casefold()
     return s
 
 def hash_text(text: str, *, return_hex=True) -> str | bytes:
-    text = canon_text(text)
+    """Ожидает уже канонизированный текст(canon_text), повторно его не нормализует"""
     d = h_digest(text.encode("utf-8"))
     return d.hex() if return_hex else d
 
 def hash_seq(ints: list[int]) -> str:
-    payload = bytearray()
-    payload += struct.pack("<Q", len(ints))          # длина
-    for x in ints:
-        payload += struct.pack("<q", int(x))         # signed 64-bit LE
-    return blake3.blake3(payload).hexdigest(16)  # 128 бит
+    n = len(ints)
+    # длина + signed 64-bit LE одним вызовом pack вместо поэлементной сборки
+    payload = struct.pack(f"<Q{n}q", n, *map(int, ints))
+    return h_digest(payload).hex()  # 128 бит
 
 
 def hash_attachment_id(ints: list[int]) -> str:
@@ -50,8 +58,9 @@ def hash_attachment_id(ints: list[int]) -> str:
 
 def hashes_equal(h1: str | bytes | None, h2: str | bytes | None) -> bool:
     """Если хэш равны, то возвращаем True, в противном случае False"""
+    # хэши не секреты, а отпечатки изменений — constant-time сравнение не нужно
     a = (h1 or b"")
     b = (h2 or b"")
     if isinstance(a, str): a = a.encode()
     if isinstance(b, str): b = b.encode()
-    return hmac.compare_digest(a, b)
\ No newline at end of file
+    return a == b
\ No newline at end of file
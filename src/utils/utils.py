@@ -1,17 +1,18 @@
-import pytz
 import logging
 from datetime import datetime
+from zoneinfo import ZoneInfo
+
+"""Таймзона создается один раз на модуль, а не на каждую строку лога"""
+TZ = ZoneInfo("Asia/Novosibirsk")
 
 def current_time() -> str:
-    current_time_zone = datetime.now(pytz.utc)
-    utc_plus_7 = current_time_zone.astimezone(pytz.timezone("Asia/Novosibirsk"))
-    time = utc_plus_7.strftime("%Y-%m-%d %H:%M:%S")
+    time = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
     return time
 
 class CustomFormatter(logging.Formatter):
     def __init__(self, fmt=None, datefmt=None, style='{', tz=None):
         super().__init__(fmt=fmt, datefmt=datefmt, style=style)
-        self.tz = tz
+        self.tz = tz or TZ
 
     def formatTime(self, record, datefmt=None):
         dt = datetime.fromtimestamp(record.created, tz=self.tz)